@@ -0,0 +1,105 @@
+"""
+On-the-fly augmentation of fingerprint batches.
+
+The functions take a [batch, height, width, channels] array in [-1, 1], but
+the loader calls `augment_batch` on one image at a time
+(`data_loader._load_image` passes `slots[slot, i:i + 1]`), so that the images
+of a batch are spread over the pool workers. Vectorizing over the batch was
+given up on purpose for that: augmenting a 650px image costs about 40 ms of
+one core, which only hides behind the training step when all cores share it.
+"""
+import numpy as np
+
+
+def shard_rng(seed, epoch, step, index=0):
+    """RNG of one image (shard) of a batch, independent of the worker that processes it."""
+    return np.random.RandomState([seed, epoch, step, index])
+
+
+def random_crop_offsets(rng, batch_size, max_shift):
+    """(dy, dx) offsets from the center crop, uniform in [-max_shift, max_shift]."""
+    return rng.randint(-max_shift, max_shift + 1, size=(batch_size, 2))
+
+
+def _smooth_basis(size, knots):
+    """[size, knots] gaussian interpolation weights, each row sums to one."""
+    spacing = (size - 1) / float(knots - 1)
+    dist = np.arange(size)[:, None] - np.arange(knots)[None, :] * spacing
+    basis = np.exp(-0.5 * (dist / spacing) ** 2)
+    return basis / basis.sum(axis=1, keepdims=True)
+
+
+def elastic_field(rng, batch_size, height, width, alpha, grid=32):
+    """
+    Smooth random displacement fields of shape [batch, height, width] for y and x.
+
+    Noise is drawn on a coarse grid (one knot every `grid` pixels) and expanded
+    with separable gaussian weights, two small matmuls per field instead of
+    filtering full resolution noise. `alpha` is the maximal displacement in pixels.
+    """
+    b_y = _smooth_basis(height, max(2, height // grid))
+    b_x = _smooth_basis(width, max(2, width // grid))
+    fields = []
+    for _ in range(2):
+        coarse = rng.uniform(-alpha, alpha, size=(batch_size, b_y.shape[1], b_x.shape[1]))
+        fields.append(np.matmul(np.matmul(b_y, coarse), b_x.T))
+    return fields
+
+
+def warp(images, rng, max_rotation=8., elastic_alpha=2., elastic_grid=32):
+    """Random rotation in [-max_rotation, max_rotation] degrees plus elastic distortion."""
+    from scipy import ndimage
+
+    if max_rotation <= 0 and elastic_alpha <= 0:
+        return images
+    b, h, w, c = images.shape
+    theta = np.deg2rad(rng.uniform(-max_rotation, max_rotation, size=b))[:, None, None]
+    cy, cx = (h - 1) / 2., (w - 1) / 2.
+    yy, xx = np.meshgrid(np.arange(h) - cy, np.arange(w) - cx, indexing='ij')
+
+    # inverse mapping: output pixel -> source pixel, rotated about the image center
+    src_y = np.cos(theta) * yy - np.sin(theta) * xx + cy
+    src_x = np.sin(theta) * yy + np.cos(theta) * xx + cx
+    if elastic_alpha > 0:
+        d_y, d_x = elastic_field(rng, b, h, w, elastic_alpha, elastic_grid)
+        src_y += d_y
+        src_x += d_x
+    # one 2-D interpolation per image: a batch axis in the coordinates would make
+    # map_coordinates interpolate in 3-D, more than twice as slow for the same result
+    warped = np.empty_like(images)
+    for k in range(b):
+        for ch in range(c):
+            warped[k, ..., ch] = ndimage.map_coordinates(
+                images[k, ..., ch], [src_y[k], src_x[k]], order=1, mode='nearest')
+    return warped
+
+
+def adjust_intensity(images, rng, contrast=(0.8, 1.2), pressure=(0.7, 1.4)):
+    """
+    Per-image contrast scaling around the mean and a gamma curve that mimics
+    finger pressure: gamma > 1 darkens and thickens ridges, gamma < 1 fades them.
+    """
+    b = images.shape[0]
+    x = (images + 1.) / 2.
+    gamma = np.exp(rng.uniform(np.log(pressure[0]), np.log(pressure[1]), size=(b, 1, 1, 1)))
+    x = np.clip(x, 0., 1.) ** gamma
+    scale = rng.uniform(contrast[0], contrast[1], size=(b, 1, 1, 1))
+    mean = x.mean(axis=(1, 2, 3), keepdims=True)
+    x = np.clip(mean + scale * (x - mean), 0., 1.)
+    return x * 2. - 1.
+
+
+def augment_batch(images, rng, max_rotation=8., elastic_alpha=2., elastic_grid=32,
+                  contrast=(0.8, 1.2), pressure=(0.7, 1.4)):
+    """
+    Args:
+      images: [batch, height, width, channels] array in [-1, 1].
+      rng: np.random.RandomState, see `shard_rng`.
+      max_rotation: (optional) Maximal rotation in degrees. [8]
+      elastic_alpha: (optional) Maximal elastic displacement in pixels, 0 disables it. [2]
+      elastic_grid: (optional) Spacing of the elastic noise knots in pixels. [32]
+      contrast: (optional) Range of the contrast scale. [(0.8, 1.2)]
+      pressure: (optional) Range of the pressure gamma. [(0.7, 1.4)]
+    """
+    images = warp(images, rng, max_rotation, elastic_alpha, elastic_grid)
+    return adjust_intensity(images, rng, contrast, pressure).astype(np.float32)
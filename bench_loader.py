@@ -0,0 +1,67 @@
+"""
+Input pipeline throughput, with and without augmentation.
+
+Batches are pulled from `BatchLoader` while the consumer sleeps --step_time
+seconds per batch to stand in for the training step. If the loader keeps up,
+steps/sec is the same in both modes and close to 1 / step_time.
+
+    python bench_loader.py --data_dir ./data --dataset nist14 --step_time 0.5
+"""
+from __future__ import print_function
+import os
+import time
+from glob import glob
+
+from absl import app, flags
+
+flags.DEFINE_string("data_dir", "./data", "Root directory of dataset [data]")
+flags.DEFINE_string("dataset", "nist14", "The name of dataset [nist14]")
+flags.DEFINE_string("input_fname_pattern", "*.jpg", "Glob pattern of filename of input images [*.jpg]")
+flags.DEFINE_integer("input_height", 650, "The size of image to use (will be center cropped) [650]")
+flags.DEFINE_integer("output_height", 650, "The size of the output images to produce [650]")
+flags.DEFINE_integer("batch_size", 4, "The size of batch images [4]")
+flags.DEFINE_integer("decode_workers", 0, "Number of image decoding processes, 0 for one per CPU [0]")
+flags.DEFINE_string("decoder", "auto", "Image decoder backend [auto]")
+flags.DEFINE_integer("batches", 50, "Number of batches timed per mode [50]")
+flags.DEFINE_float("step_time", 0., "Simulated training step in seconds [0]")
+FLAGS = flags.FLAGS
+
+
+def steps_per_sec(files, augment):
+    from data_loader import BatchLoader
+
+    batch_files = [files[(idx * FLAGS.batch_size) % len(files):][:FLAGS.batch_size] for idx in range(FLAGS.batches)]
+    batch_files = [batch for batch in batch_files if len(batch) == FLAGS.batch_size]
+    with BatchLoader([FLAGS.output_height, FLAGS.output_height, 1], FLAGS.batch_size,
+                     num_workers=FLAGS.decode_workers,
+                     augment=dict() if augment else None,
+                     max_crop_shift=16 if augment else 0,
+                     input_height=FLAGS.input_height,
+                     input_width=FLAGS.input_height,
+                     resize_height=FLAGS.output_height,
+                     resize_width=FLAGS.output_height,
+                     grayscale=True,
+                     decoder=FLAGS.decoder) as loader:
+        batches = loader.load(batch_files)
+        # the first batch includes starting the pool
+        next(batches)
+        start = time.time()
+        steps = 0
+        for _ in batches:
+            time.sleep(FLAGS.step_time)
+            steps += 1
+        return steps / (time.time() - start)
+
+
+def main(_):
+    files = sorted(glob(os.path.join(FLAGS.data_dir, FLAGS.dataset, FLAGS.input_fname_pattern)))
+    if len(files) < FLAGS.batch_size:
+        raise Exception("[!] Not enough images in '" + os.path.join(FLAGS.data_dir, FLAGS.dataset) + "'")
+    plain = steps_per_sec(files, augment=False)
+    augmented = steps_per_sec(files, augment=True)
+    print(" [*] steps/sec: plain %.2f, augmented %.2f (%.2fx), simulated step %.3fs"
+          % (plain, augmented, augmented / plain, FLAGS.step_time))
+
+
+if __name__ == '__main__':
+    app.run(main)
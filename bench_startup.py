@@ -0,0 +1,101 @@
+"""
+Startup-time benchmark for the command line entry points.
+
+Every case runs in a fresh interpreter, so the numbers include imports and
+flag parsing, i.e. what a short-lived job pays before doing any work.
+
+    python bench_startup.py --repeats 10
+
+The generation case runs one batch of `generate-fps.py` from the checkpoint
+in --checkpoint_dir, in a scratch directory so the samples don't pile up.
+"""
+from __future__ import print_function
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from absl import app, flags
+
+flags.DEFINE_integer("repeats", 5, "Number of runs per case [5]")
+flags.DEFINE_string("checkpoint_dir", os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoint"),
+                    "Checkpoint directory used by the generation case [<repo>/checkpoint]")
+flags.DEFINE_boolean("importtime", False, "Also print the slowest imports of each case (python>=3.7) [False]")
+FLAGS = flags.FLAGS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def cases():
+    """(name, interpreter arguments, expected exit code); absl exits with 1 after --help."""
+    return [
+        ("python (baseline)", ["-c", "pass"], 0),
+        ("main.py --help", [os.path.join(ROOT, "main.py"), "--help"], 1),
+        ("generate-fps.py --help", [os.path.join(ROOT, "generate-fps.py"), "--help"], 1),
+        ("import utils", ["-c", "import utils"], 0),
+        ("import pre_process", ["-c", "import pre_process"], 0),
+        ("import model", ["-c", "import model"], 0),
+        ("generate 1 batch", [os.path.join(ROOT, "generate-fps.py"), "--generate_test_images", "1",
+                              "--checkpoint_dir", FLAGS.checkpoint_dir], 0),
+    ]
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    """Working directory with the `samples` folder `visualize` writes to."""
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, "samples"))
+    try:
+        yield workdir
+    finally:
+        shutil.rmtree(workdir)
+
+
+def repo_env():
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+
+
+def time_case(args, repeats):
+    timings = []
+    returncodes = []
+    with scratch_dir() as workdir, open(os.devnull, "w") as devnull:
+        for _ in range(repeats):
+            start = time.time()
+            returncodes.append(subprocess.call([sys.executable] + args, cwd=workdir, env=repo_env(),
+                                               stdout=devnull, stderr=devnull))
+            timings.append(time.time() - start)
+    return sorted(timings), returncodes
+
+
+def slowest_imports(args, top=5):
+    with scratch_dir() as workdir:
+        proc = subprocess.Popen([sys.executable, "-X", "importtime"] + args, cwd=workdir, env=repo_env(),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        _, err = proc.communicate()
+    imports = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [field.strip() for field in line[len("import time:"):].split("|")]
+        imports.append((int(cumulative), name))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main(_):
+    print("%-24s %10s %10s %10s  %s" % ("case", "min [s]", "median [s]", "max [s]", "status"))
+    for name, args, expected in cases():
+        timings, returncodes = time_case(args, FLAGS.repeats)
+        failed = [code for code in returncodes if code != expected]
+        status = "FAILED (exit %s)" % ", ".join(str(code) for code in sorted(set(failed))) if failed else "ok"
+        print("%-24s %10.3f %10.3f %10.3f  %s" % (name, timings[0], timings[len(timings) // 2], timings[-1],
+                                                   status))
+        if FLAGS.importtime:
+            for cumulative, module in slowest_imports(args):
+                print("    %8.3f  %s" % (cumulative / 1e6, module))
+
+
+if __name__ == '__main__':
+    app.run(main)
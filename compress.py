@@ -0,0 +1,115 @@
+"""
+Compresses the generator of a trained checkpoint to int8 (optionally pruned)
+and reports size, throughput and pixel deviation against the float32 sampler.
+
+    python compress.py --dataset grayscale --sparsity 0.5
+"""
+import os
+import time
+import numpy as np
+
+from absl import app, flags
+
+from utils import pp
+
+flags.DEFINE_string("checkpoint_dir", "checkpoint", "Directory name of the checkpoints [checkpoint]")
+flags.DEFINE_string("dataset", "grayscale", "The name of dataset the model was trained on [grayscale]")
+flags.DEFINE_integer("batch_size", 4, "The batch size the model was trained with [4]")
+flags.DEFINE_integer("output_height", 650, "The size of the output images [650]")
+flags.DEFINE_integer("output_width", None, "The size of the output images. If None, same value as output_height [None]")
+flags.DEFINE_float("sparsity", 0., "Fraction of the smallest weights of every layer set to zero [0]")
+flags.DEFINE_string("output", None, "Path of the compressed generator, defaults to <checkpoint>.int8.npz [None]")
+flags.DEFINE_integer("bench_batches", 20, "Number of batches timed for each generator [20]")
+flags.DEFINE_integer("seed", 0, "Seed of the z-vectors used for the comparison [0]")
+FLAGS = flags.FLAGS
+
+
+def images_per_sec(sess, sampler, z, feed_z, batches):
+    sess.run(sampler, feed_dict={z: feed_z})
+    start = time.time()
+    for _ in range(batches):
+        sess.run(sampler, feed_dict={z: feed_z})
+    return batches * feed_z.shape[0] / (time.time() - start)
+
+
+def main(_):
+    import tensorflow as tf
+    from model import DCGAN, model_dir_name
+    from quantize import GENERATOR_LAYERS, QuantizedGenerator, compress_generator
+
+    pp.pprint(FLAGS.flag_values_dict())
+
+    if FLAGS.output_width is None:
+        FLAGS.output_width = FLAGS.output_height
+    if not 0 <= FLAGS.sparsity < 1:
+        raise Exception("[!] --sparsity must be in [0, 1), got {}".format(FLAGS.sparsity))
+
+    model_dir = model_dir_name(FLAGS.dataset, FLAGS.batch_size, FLAGS.output_height, FLAGS.output_width)
+    ckpt_path = tf.train.latest_checkpoint(os.path.join(FLAGS.checkpoint_dir, model_dir))
+    if ckpt_path is None:
+        raise Exception("[!] No checkpoint found in '" + os.path.join(FLAGS.checkpoint_dir, model_dir) + "'")
+    output = FLAGS.output or ckpt_path + ".int8.npz"
+    if not output.endswith(".npz"):
+        # np.savez_compressed would append it anyway
+        output += ".npz"
+
+    # compress
+    reader = tf.train.NewCheckpointReader(ckpt_path)
+    weights = compress_generator(reader, FLAGS.sparsity)
+    np.savez_compressed(output, **weights)
+    print(" [*] Wrote {}".format(output))
+
+    shapes = reader.get_variable_to_shape_map()
+    float_bytes = 4 * sum(int(np.prod(shape)) for name, shape in shapes.items()
+                          if name.startswith('generator/') and 'Adam' not in name)
+    int8_bytes = sum(array.nbytes for array in weights.values())
+    file_bytes = os.path.getsize(output)
+    zeros = sum(int((weights[layer + '/q'] == 0).sum()) for layer, _ in GENERATOR_LAYERS)
+    params = sum(weights[layer + '/q'].size for layer, _ in GENERATOR_LAYERS)
+
+    # compare against the float32 sampler
+    run_config = tf.ConfigProto()
+    run_config.gpu_options.allow_growth = True
+
+    with tf.Session(config=run_config) as sess:
+        z_dim = weights['g_h0_lin/q'].shape[0]
+        dcgan = DCGAN(
+            sess,
+            output_height=FLAGS.output_height,
+            output_width=FLAGS.output_width,
+            batch_size=FLAGS.batch_size,
+            sample_num=FLAGS.batch_size,
+            z_dim=z_dim,
+            gen_input_layer_depth=weights['g_h4/q'].shape[3],
+            dataset_name=FLAGS.dataset,
+            checkpoint_dir=FLAGS.checkpoint_dir)
+        if not dcgan.load(FLAGS.checkpoint_dir):
+            raise Exception("[!] Train a model first, then compress it")
+        quantized = QuantizedGenerator(sess, weights,
+                                       batch_size=FLAGS.batch_size,
+                                       output_height=FLAGS.output_height,
+                                       output_width=FLAGS.output_width)
+
+        z = np.random.RandomState(FLAGS.seed).uniform(-1, 1, size=(FLAGS.batch_size, z_dim))
+        reference = sess.run(dcgan.sampler, feed_dict={dcgan.z: z})
+        samples = sess.run(quantized.sampler, feed_dict={quantized.z: z})
+
+        float_speed = images_per_sec(sess, dcgan.sampler, dcgan.z, z, FLAGS.bench_batches)
+        int8_speed = images_per_sec(sess, quantized.sampler, quantized.z, z, FLAGS.bench_batches)
+
+    # deviation in 8 bit pixel values, outputs are in [-1, 1]
+    diff = np.abs(samples - reference) * 127.5
+    mse = np.mean(diff ** 2)
+    psnr = 10 * np.log10(255. ** 2 / mse) if mse > 0 else float('inf')
+
+    print(" [*] Size: float32 %.2f MB, int8 %.2f MB (%.1fx), compressed file %.2f MB (%.1fx)"
+          % (float_bytes / 1e6, int8_bytes / 1e6, float_bytes / float(int8_bytes),
+             file_bytes / 1e6, float_bytes / float(file_bytes)))
+    print(" [*] Sparsity: %.1f%% of %d weights are zero" % (100. * zeros / params, params))
+    print(" [*] Speed: float32 %.2f images/sec, folded, dequantized int8 weights %.2f images/sec (%.2fx)"
+          % (float_speed, int8_speed, int8_speed / float_speed))
+    print(" [*] Deviation [0-255]: max %.2f, mean %.3f, PSNR %.2f dB" % (diff.max(), diff.mean(), psnr))
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -0,0 +1,140 @@
+"""
+Background batch loading.
+
+Images are decoded and pre-processed in a process pool that writes straight
+into a ring of batch slots living in shared memory. Workers only send back
+the slot index, so decoded pixels never get pickled between processes.
+Every image is its own task (decode, crop, augment), so all workers stay busy
+even with small batches.
+"""
+import multiprocessing
+from collections import deque
+
+import numpy as np
+
+from augment import augment_batch, random_crop_offsets, shard_rng
+from decoders import get_decoder
+from pre_process import get_image
+
+# per-process state, filled in by `_init_worker`
+_worker = {}
+
+
+def _context():
+    # the trainer already runs TF/CUDA threads, which a plain fork would copy in an
+    # undefined state; forkserver children start from a clean single threaded process
+    try:
+        return multiprocessing.get_context('forkserver')
+    except (AttributeError, ValueError):
+        return multiprocessing
+
+
+def _init_worker(buf, slot_shape, image_kwargs, augment, max_crop_shift, seed):
+    _worker['slots'] = np.frombuffer(buf, dtype=np.float32).reshape(slot_shape)
+    _worker['image_kwargs'] = image_kwargs
+    _worker['augment'] = augment
+    _worker['max_crop_shift'] = max_crop_shift
+    _worker['seed'] = seed
+
+
+def _load_image(slot, i, path, epoch, step):
+    slots = _worker['slots']
+    # everything random about an image derives from (seed, epoch, step, i), so the
+    # result doesn't depend on which worker picks it up
+    rng = shard_rng(_worker['seed'], epoch, step, i)
+    crop_offset = (0, 0)
+    if _worker['max_crop_shift'] > 0:
+        crop_offset = tuple(random_crop_offsets(rng, 1, _worker['max_crop_shift'])[0])
+    image = get_image(path, crop_offset=crop_offset, **_worker['image_kwargs'])
+    slots[slot, i] = image.reshape(slots.shape[2:])
+    if _worker['augment'] is not None:
+        slots[slot, i:i + 1] = augment_batch(slots[slot, i:i + 1], rng, **_worker['augment'])
+    return slot
+
+
+class BatchLoader(object):
+    def __init__(self, image_dims, batch_size, num_workers=0, prefetch=None,
+                 augment=None, max_crop_shift=0, seed=0, **image_kwargs):
+        """
+        Args:
+          image_dims: [height, width, channels] of a pre-processed image.
+          batch_size: Number of images per batch.
+          num_workers: (optional) Size of the decoding pool, 0 means one per CPU. [0]
+          prefetch: (optional) Number of batches decoded ahead of the consumer, None
+            for enough to keep every worker busy (at least 2). [None]
+          augment: (optional) Keyword arguments of `augment.augment_batch`, None disables augmentation. [None]
+          max_crop_shift: (optional) Maximal random offset of the crop window in pixels. [0]
+          seed: (optional) Base seed of the per image augmentation RNG. [0]
+          image_kwargs: Forwarded to `pre_process.get_image`.
+        """
+        self.batch_size = batch_size
+        num_workers = num_workers or multiprocessing.cpu_count()
+        if prefetch is None:
+            prefetch = max(2, -(-num_workers // batch_size))
+        self.prefetch = max(1, prefetch)
+        # one slot handed out to the consumer + `prefetch` slots being filled
+        self.num_slots = self.prefetch + 1
+        slot_shape = (self.num_slots, batch_size) + tuple(image_dims)
+
+        # an unusable decoder should fail here, not on the first image in a worker
+        get_decoder(image_kwargs.get('decoder', 'auto'))
+
+        context = _context()
+        buf = context.RawArray('f', int(np.prod(slot_shape)))
+        self.slots = np.frombuffer(buf, dtype=np.float32).reshape(slot_shape)
+        self.pool = context.Pool(num_workers,
+                                 initializer=_init_worker,
+                                 initargs=(buf, slot_shape, image_kwargs, augment, max_crop_shift, seed))
+
+    def _submit(self, slot, batch_files, epoch, step):
+        if len(batch_files) != self.batch_size:
+            raise ValueError("[!] Expected %d files per batch, got %d" % (self.batch_size, len(batch_files)))
+        return slot, [self.pool.apply_async(_load_image, (slot, i, path, epoch, step))
+                      for i, path in enumerate(batch_files)]
+
+    def load(self, batches, epoch=0, start=0):
+        """
+        Yields a [batch_size, height, width, channels] float32 array for every list
+        of files in `batches`. The array is a view into shared memory that gets
+        overwritten once the next batch is requested, copy it if it must outlive
+        the current step.
+
+        `epoch` and the step (`start` + position in `batches`) select the
+        augmentation RNG, pass the index of the first batch when resuming mid-epoch.
+        """
+        batches = iter(batches)
+        pending = deque()
+        submitted = 0
+        for batch_files in batches:
+            pending.append(self._submit(submitted % self.num_slots, batch_files, epoch, start + submitted))
+            submitted += 1
+            if submitted == self.prefetch:
+                break
+
+        while pending:
+            slot, results = pending.popleft()
+            for result in results:
+                result.get()
+            # the consumer is done with the previous slot, so it can be refilled now
+            batch_files = next(batches, None)
+            if batch_files is not None:
+                pending.append(self._submit(submitted % self.num_slots, batch_files, epoch, start + submitted))
+                submitted += 1
+            yield self.slots[slot]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
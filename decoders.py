@@ -0,0 +1,125 @@
+"""
+Image decoders for the input pipeline.
+
+Every backend returns a float32 array (HxW for grayscale, HxWx3 otherwise).
+The grayscale paths ask the codec for the luma plane directly instead of
+decoding to RGB and flattening afterwards.
+"""
+import importlib
+
+import numpy as np
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+_turbo_jpeg = None
+
+
+def _decode_turbojpeg(path, grayscale=False):
+    global _turbo_jpeg
+    from turbojpeg import TurboJPEG, TJPF_GRAY, TJPF_RGB
+
+    if not path.lower().endswith(JPEG_EXTENSIONS):
+        return _decode_pil(path, grayscale)
+    if _turbo_jpeg is None:
+        _turbo_jpeg = TurboJPEG()
+    with open(path, 'rb') as f:
+        img = _turbo_jpeg.decode(f.read(), pixel_format=TJPF_GRAY if grayscale else TJPF_RGB)
+    if grayscale:
+        img = img[:, :, 0]
+    return img.astype(np.float32)
+
+
+def _decode_opencv(path, grayscale=False):
+    import cv2
+
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+    if img is None:
+        raise IOError("[!] Could not decode '" + path + "'")
+    if not grayscale:
+        img = img[:, :, ::-1]
+    return img.astype(np.float32)
+
+
+def _decode_pil(path, grayscale=False):
+    from PIL import Image
+
+    img = Image.open(path)
+    if grayscale:
+        # JPEG only: have libjpeg emit the Y channel and skip the color conversion
+        img.draft('L', img.size)
+        img = img.convert('L')
+    else:
+        img = img.convert('RGB')
+    return np.asarray(img, dtype=np.float32)
+
+
+def _decode_scipy(path, grayscale=False):
+    import scipy.misc
+
+    return scipy.misc.imread(path, flatten=grayscale).astype(np.float32)
+
+
+def _probe_turbojpeg():
+    from turbojpeg import TurboJPEG
+    # the module imports fine without the libturbojpeg shared library
+    TurboJPEG()
+
+
+def _probe_module(name, attr=None):
+    def probe():
+        module = importlib.import_module(name)
+        if attr is not None:
+            getattr(module, attr)
+    return probe
+
+
+# fastest first; 'auto' picks the first one whose probe succeeds
+DECODERS = [
+    ('turbojpeg', _decode_turbojpeg, _probe_turbojpeg),
+    ('opencv', _decode_opencv, _probe_module('cv2')),
+    ('pil', _decode_pil, _probe_module('PIL.Image')),
+    ('scipy', _decode_scipy, _probe_module('scipy.misc', 'imread')),
+]
+
+_resolved = {}
+
+
+def available_decoders():
+    names = []
+    for name, _, probe in DECODERS:
+        try:
+            probe()
+        except Exception:
+            continue
+        names.append(name)
+    return names
+
+
+def get_decoder(name='auto'):
+    """
+    Returns a `decode(path, grayscale=False)` function.
+
+    Args:
+      name: One of 'auto', 'turbojpeg', 'opencv', 'pil' or 'scipy'. ['auto']
+    """
+    if name in _resolved:
+        return _resolved[name]
+
+    decoders = dict((n, (decode, probe)) for n, decode, probe in DECODERS)
+    if name == 'auto':
+        available = available_decoders()
+        if not available:
+            raise ImportError("[!] No image decoder available, install Pillow or scipy")
+        decode = decoders[available[0]][0]
+    elif name in decoders:
+        decode, probe = decoders[name]
+        # fail here rather than on the first image inside a pool worker
+        try:
+            probe()
+        except Exception as err:
+            raise ImportError("[!] Decoder '" + name + "' is not available: " + str(err))
+    else:
+        raise ValueError("[!] Unknown decoder '" + name + "', expected one of: auto, " +
+                         ", ".join(n for n, _, _ in DECODERS))
+    _resolved[name] = decode
+    return decode
@@ -1,14 +1,30 @@
-import tensorflow as tf
+from absl import app, flags
 
-from model import DCGAN, visualize
+flags.DEFINE_string("checkpoint_dir", "checkpoint", "Directory name of the checkpoints [checkpoint]")
+flags.DEFINE_string("dataset", "grayscale", "The name of dataset the model was trained on [grayscale]")
+flags.DEFINE_integer("generate_test_images", 1000, "Number of batches to generate [1000]")
+flags.DEFINE_integer("batch_size", 4, "The batch size the model was trained with [4]")
+FLAGS = flags.FLAGS
 
-with tf.Session() as sess:
-    dcgan = DCGAN(
-        sess,
-        dataset_name='grayscale',
-        input_fname_pattern='*.png',
-        checkpoint_dir='checkpoint',
-    )
 
-    dcgan.load('checkpoint')
-    visualize(sess, dcgan, dict(generate_test_images= 1000, batch_size= 4, z_dim=1))
+def main(_):
+    import tensorflow as tf
+
+    from model import DCGAN
+    from utils import visualize
+
+    with tf.Session() as sess:
+        dcgan = DCGAN(
+            sess,
+            batch_size=FLAGS.batch_size,
+            dataset_name=FLAGS.dataset,
+            input_fname_pattern='*.png',
+            checkpoint_dir=FLAGS.checkpoint_dir,
+        )
+
+        dcgan.load(FLAGS.checkpoint_dir)
+        visualize(sess, dcgan, dict(generate_test_images=FLAGS.generate_test_images, batch_size=FLAGS.batch_size))
+
+
+if __name__ == '__main__':
+    app.run(main)
@@ -1,19 +1,23 @@
 import os
 import numpy as np
 
-from model import DCGAN
-from utils import pp, visualize, show_all_variables
+from absl import app, flags
 
-import tensorflow as tf
+from utils import pp
+
+# tensorflow and the model are imported inside `main` so that `--help` and
+# flag errors don't pay for them
 
-flags = tf.app.flags
 # IO
 flags.DEFINE_string("checkpoint_dir", "checkpoint", "Directory name to save the checkpoints [checkpoint]")
 flags.DEFINE_string("data_dir", "./data", "Root directory of dataset [data]")
 flags.DEFINE_string("sample_dir", "samples", "Directory name to save the image samples [samples]")
 flags.DEFINE_integer("summary_steps", 100, "write to summery file each summary_steps steps")
 flags.DEFINE_integer("eval_steps", 100, "run evaluation each eval_steps steps")
-flags.DEFINE_integer("save_ckpt_steps", 100, "save checkpoint file each save_ckpt_steps steps")
+flags.DEFINE_integer("save_ckpt_steps", 100, "save checkpoint file each save_ckpt_steps steps. Training "
+                     "checkpoints include the Adam slots and take ~3x the model size (g_h0_lin alone is "
+                     "generate_test_images x 512*41*41 weights at 650px, ~258M for the default 300, "
+                     "as generate_test_images is used as z_dim)")
 # Data
 flags.DEFINE_string("dataset", "nist14", "The name of dataset [nist14, FVC]")
 flags.DEFINE_string("input_fname_pattern", "*.jpg", "Glob pattern of filename of input images [*]")
@@ -24,9 +28,19 @@ flags.DEFINE_integer("output_height", 650, "The size of the output images to pro
 flags.DEFINE_integer("output_width", None,
                      "The size of the output images to produce. If None, same value as output_height [None]")
 flags.DEFINE_boolean("crop", True, "True for training, False for testing [False]")
+flags.DEFINE_string("decoder", "auto", "Image decoder backend [auto, turbojpeg, opencv, pil, scipy]")
+flags.DEFINE_integer("decode_workers", 0, "Number of image decoding processes, 0 for one per CPU [0]")
+# Augmentation
+flags.DEFINE_boolean("augment", False, "Randomly augment the training batches [False]")
+flags.DEFINE_integer("augment_seed", 0, "Base seed of the per image augmentation RNG [0]")
+flags.DEFINE_integer("aug_max_shift", 16, "Maximal random offset of the crop window in pixels, only has an effect "
+                                          "on images larger than input_height x input_width [16]")
+flags.DEFINE_float("aug_max_rotation", 8., "Maximal rotation in degrees [8]")
+flags.DEFINE_float("aug_elastic_alpha", 2., "Maximal elastic displacement in pixels, 0 to disable [2]")
 # Mode
 flags.DEFINE_boolean("train", False, "True for training, False for testing [False]")
 flags.DEFINE_boolean("visualize", False, "True for visualizing, False for nothing [False]")
+flags.DEFINE_boolean("show_variables", False, "Print the trainable variables analysis [False]")
 flags.DEFINE_integer("generate_test_images", 300, "Number of images to generate during test. [100]")
 # Hyper-params
 flags.DEFINE_integer("epoch", 25, "Epoch to train [25]")
@@ -34,11 +48,16 @@ flags.DEFINE_float("learning_rate", 0.0002, "Learning rate of for adam [0.0002]"
 flags.DEFINE_float("beta1", 0.5, "Momentum term of adam [0.5]")
 flags.DEFINE_float("train_size", np.inf, "The size of train images [np.inf]")
 flags.DEFINE_integer("batch_size", 4, "The size of batch images [64]")
+flags.DEFINE_integer("seed", None, "Seed of the NumPy and TensorFlow RNGs, None for a random run [None]")
 FLAGS = flags.FLAGS
 
 
 def main(_):
-    pp.pprint(flags.FLAGS.__flags)
+    import tensorflow as tf
+    from model import DCGAN
+    from utils import visualize, show_all_variables
+
+    pp.pprint(FLAGS.flag_values_dict())
 
     if FLAGS.input_width is None:
         FLAGS.input_width = FLAGS.input_height
@@ -50,6 +69,10 @@ def main(_):
     if not os.path.exists(FLAGS.sample_dir):
         os.makedirs(FLAGS.sample_dir)
 
+    if FLAGS.seed is not None:
+        np.random.seed(FLAGS.seed)
+        tf.set_random_seed(FLAGS.seed)
+
     run_config = tf.ConfigProto()
     run_config.gpu_options.allow_growth = True
 
@@ -69,12 +92,13 @@ def main(_):
             checkpoint_dir=FLAGS.checkpoint_dir,
             data_dir=FLAGS.data_dir)
 
-        show_all_variables()
+        if FLAGS.show_variables:
+            show_all_variables()
 
         if FLAGS.train:
             dcgan.train(FLAGS)
         else:
-            if not dcgan.load(FLAGS.checkpoint_dir)[0]:
+            if not dcgan.load(FLAGS.checkpoint_dir):
                 raise Exception("[!] Train a model first, then run test mode")
 
         # visualization code run both in train/test mode.
@@ -82,4 +106,4 @@ def main(_):
 
 
 if __name__ == '__main__':
-    tf.app.run()
+    app.run(main)
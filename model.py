@@ -1,17 +1,29 @@
 from __future__ import division
+import math
 import os
+import pickle
 import time
 from glob import glob
 
-from ops import *
-from utils import *
-from pre_process import *
+import numpy as np
+import tensorflow as tf
+from six.moves import xrange
+
+from ops import batch_norm, conv2d, deconv2d, linear, lrelu, \
+    image_summary, scalar_summary, histogram_summary, merge_summary, SummaryWriter
+from utils import save_images, image_manifold_size
+from pre_process import get_image
+from data_loader import BatchLoader
 
 
 def conv_out_size_same(size, stride):
     return int(math.ceil(float(size) / float(stride)))
 
 
+def model_dir_name(dataset_name, batch_size, output_height, output_width):
+    return "{}_{}_{}_{}".format(dataset_name, batch_size, output_height, output_width)
+
+
 class DCGAN(object):
     def __init__(self, sess, input_height=650, input_width=650, crop=True,
                  batch_size=4, sample_num=64, output_height=650, output_width=650,
@@ -56,6 +68,8 @@ class DCGAN(object):
         self.input_fname_pattern = input_fname_pattern
         self.checkpoint_dir = checkpoint_dir
         self.data_dir = data_dir
+        # training progress restored by `load`, see `train_state`
+        self.train_state = None
         # Read dataset files
         # self.read_dataset_files()
 
@@ -141,58 +155,63 @@ class DCGAN(object):
         self.writer = SummaryWriter("./logs", self.sess.graph)
 
     def train(self, config):
-        d_optim, g_optim = self.create_optimizer(config)
-        try:
-            tf.global_variables_initializer().run()
-        except:
-            tf.initialize_all_variables().run()
-
-        # load samples
-        sample_inputs, sample_z = self.sample_inputs_and_z()
-        counter = self.load(self.checkpoint_dir)
-
-        # run epochs
-        start_time = time.time()
-        for epoch in xrange(config.epoch):
-            self.data = glob(os.path.join(config.data_dir, config.dataset, self.input_fname_pattern))
-            np.random.shuffle(self.data)
-            batch_idxs = min(len(self.data), config.train_size) // config.batch_size
-
-            for idx in xrange(0, int(batch_idxs)):
-                batch_files = self.data[idx * config.batch_size:(idx + 1) * config.batch_size]
-                batch = [
-                    pp.get_image(batch_file,
-                              input_height=self.input_height,
-                              input_width=self.input_width,
-                              resize_height=self.output_height,
-                              resize_width=self.output_width,
-                              crop=self.crop,
-                              grayscale=self.grayscale) for batch_file in batch_files]
-                if self.grayscale:
-                    batch_images = np.array(batch).astype(np.float32)[:, :, :, None]
+        # start the decoding pool before the session runs anything
+        with self.create_loader(config) as loader:
+            d_optim, g_optim = self.create_optimizer(config)
+            try:
+                tf.global_variables_initializer().run()
+            except:
+                tf.initialize_all_variables().run()
+
+            # the build_model saver predates the optimizer, this one also covers the Adam slots
+            self.saver = tf.train.Saver()
+
+            # load samples
+            self.data = self.dataset_files(config)
+            sample_inputs, sample_z = self.sample_inputs_and_z(config.decoder)
+            counter = self.load(self.checkpoint_dir)
+            start_epoch, start_idx = 0, 0
+            resume = self.train_state
+            if resume is not None:
+                # pick up at the exact batch, data order and random stream the checkpoint was written at
+                start_epoch, start_idx = resume['epoch'], resume['idx']
+                sample_z = resume['sample_z']
+                np.random.set_state(resume['np_random'])
+
+            # run epochs
+            start_time = time.time()
+            for epoch in xrange(start_epoch, config.epoch):
+                if resume is not None and epoch == start_epoch:
+                    self.data = list(resume['data'])
                 else:
-                    batch_images = np.array(batch).astype(np.float32)
-
-                batch_z = np.random.uniform(-1, 1, [config.batch_size, self.z_dim]) \
-                    .astype(np.float32)
-
-                # Update D network
-                _, summary_str = self.sess.run([d_optim, self.d_sum],
-                                               feed_dict={self.inputs: batch_images, self.z: batch_z})
-                self.writer.add_summary(summary_str, counter)
-
-                # Update G network
-                _, summary_str = self.sess.run([g_optim, self.g_sum],
-                                               feed_dict={self.z: batch_z})
-                if idx % config.summary_steps == 0:
+                    self.data = self.dataset_files(config)
+                    np.random.shuffle(self.data)
+                    start_idx = 0
+                batch_idxs = min(len(self.data), config.train_size) // config.batch_size
+                batch_files = [self.data[idx * config.batch_size:(idx + 1) * config.batch_size]
+                               for idx in xrange(start_idx, int(batch_idxs))]
+
+                for idx, batch_images in enumerate(loader.load(batch_files, epoch, start_idx), start_idx):
+                    batch_z = np.random.uniform(-1, 1, [config.batch_size, self.z_dim]) \
+                        .astype(np.float32)
+
+                    # Update D network
+                    _, summary_str = self.sess.run([d_optim, self.d_sum],
+                                                   feed_dict={self.inputs: batch_images, self.z: batch_z})
                     self.writer.add_summary(summary_str, counter)
 
-                # Run g_optim twice to make sure that d_loss does not go to zero (different from paper)
-                _, summary_str = self.sess.run([g_optim, self.g_sum],
-                                               feed_dict={self.z: batch_z})
-                self.eval_and_save(batch_idxs, batch_images, batch_z, config, counter, epoch, idx, sample_inputs,
-                                   sample_z, start_time, summary_str)
-                counter += 1
+                    # Update G network
+                    _, summary_str = self.sess.run([g_optim, self.g_sum],
+                                                   feed_dict={self.z: batch_z})
+                    if idx % config.summary_steps == 0:
+                        self.writer.add_summary(summary_str, counter)
+
+                    # Run g_optim twice to make sure that d_loss does not go to zero (different from paper)
+                    _, summary_str = self.sess.run([g_optim, self.g_sum],
+                                                   feed_dict={self.z: batch_z})
+                    self.eval_and_save(batch_idxs, batch_images, batch_z, config, counter, epoch, idx, sample_inputs,
+                                       sample_z, start_time, summary_str)
+                    counter += 1
 
     def eval_and_save(self, batch_idxs, batch_images, batch_z, config, counter, epoch, idx, sample_inputs, sample_z,
                       start_time, summary_str):
@@ -219,25 +238,55 @@ class DCGAN(object):
             except:
                 print("one pic error!...")
         if np.mod(counter, config.save_ckpt_steps) == 0:
-            self.save(config.checkpoint_dir, counter)
-
-    def sample_inputs_and_z(self):
+            # RNG state is taken after this step's draws, so a resumed run continues the same stream
+            self.save(config.checkpoint_dir, counter, {
+                'counter': counter + 1,
+                'epoch': epoch,
+                'idx': idx + 1,
+                'data': list(self.data),
+                'np_random': np.random.get_state(),
+                'sample_z': sample_z,
+            })
+
+    def dataset_files(self, config):
+        # sorted, so that a given RNG state always produces the same shuffle
+        return sorted(glob(os.path.join(config.data_dir, config.dataset, self.input_fname_pattern)))
+
+    def sample_inputs_and_z(self, decoder='auto'):
         sample_z = np.random.uniform(-1, 1, size=(self.sample_num, self.z_dim))
         sample_files = self.data[0:self.sample_num]
         sample = [
-            pp.get_image(sample_file,
+            get_image(sample_file,
                       input_height=self.input_height,
                       input_width=self.input_width,
                       resize_height=self.output_height,
                       resize_width=self.output_width,
                       crop=self.crop,
-                      grayscale=self.grayscale) for sample_file in sample_files]
+                      grayscale=self.grayscale,
+                      decoder=decoder) for sample_file in sample_files]
         if self.grayscale:
             sample_inputs = np.array(sample).astype(np.float32)[:, :, :, None]
         else:
             sample_inputs = np.array(sample).astype(np.float32)
         return sample_inputs, sample_z
 
+    def create_loader(self, config):
+        augment = None
+        if config.augment:
+            augment = dict(max_rotation=config.aug_max_rotation, elastic_alpha=config.aug_elastic_alpha)
+        return BatchLoader(self.pre_process(), config.batch_size,
+                           num_workers=config.decode_workers,
+                           augment=augment,
+                           max_crop_shift=config.aug_max_shift if config.augment else 0,
+                           seed=config.augment_seed,
+                           input_height=self.input_height,
+                           input_width=self.input_width,
+                           resize_height=self.output_height,
+                           resize_width=self.output_width,
+                           crop=self.crop,
+                           grayscale=self.grayscale,
+                           decoder=config.decoder)
+
     def create_optimizer(self, config):
         d_optim = tf.train.AdamOptimizer(config.learning_rate, beta1=config.beta1) \
             .minimize(self.d_loss, var_list=self.d_vars)
@@ -322,21 +371,53 @@ class DCGAN(object):
 
     @property
     def model_dir(self):
-        return "{}_{}_{}_{}".format(
+        return model_dir_name(
             self.dataset_name, self.batch_size,
             self.output_height, self.output_width)
 
-    def save(self, checkpoint_dir, step):
+    def save(self, checkpoint_dir, step, train_state=None):
+        """
+        Args:
+          checkpoint_dir: Root checkpoint directory.
+          step: Global step, appended to the checkpoint name.
+          train_state: (optional) Picklable training progress stored next to the
+            checkpoint as `<checkpoint>.state` and restored by `load`. [None]
+        """
         model_name = "DCGAN.model"
         checkpoint_dir = os.path.join(checkpoint_dir, self.model_dir)
 
         if not os.path.exists(checkpoint_dir):
             os.makedirs(checkpoint_dir)
 
+        ckpt_path = os.path.join(checkpoint_dir, model_name) + "-{}".format(step)
+        if train_state is not None:
+            # written before the checkpoint: a crash in between leaves an orphaned state
+            # file, never a latest checkpoint with a stale state
+            with open(ckpt_path + ".state.tmp", "wb") as f:
+                pickle.dump(train_state, f, protocol=2)
+            os.rename(ckpt_path + ".state.tmp", ckpt_path + ".state")
+
         self.saver.save(self.sess,
                         os.path.join(checkpoint_dir, model_name),
                         global_step=step)
 
+        # drop the state of checkpoints the saver has rotated out
+        for state_file in glob(os.path.join(checkpoint_dir, model_name + "-*.state")):
+            if not os.path.exists(state_file[:-len(".state")] + ".index"):
+                os.remove(state_file)
+
+    def restore(self, ckpt_path):
+        saved = tf.train.NewCheckpointReader(ckpt_path).get_variable_to_shape_map()
+        missing = [var for var in tf.global_variables() if var.op.name not in saved]
+        if not missing:
+            self.saver.restore(self.sess, ckpt_path)
+            return
+        # e.g. checkpoints written without optimizer slots
+        print(" [!] Not in checkpoint, keeping initial values: {}".format(
+            ", ".join(var.op.name for var in missing)))
+        tf.train.Saver([var for var in tf.global_variables() if var.op.name in saved]) \
+            .restore(self.sess, ckpt_path)
+
     def load(self, checkpoint_dir):
         import re
         print(" [*] Reading checkpoints...")
@@ -345,8 +426,20 @@ class DCGAN(object):
         ckpt = tf.train.get_checkpoint_state(checkpoint_dir)
         if ckpt and ckpt.model_checkpoint_path:
             ckpt_name = os.path.basename(ckpt.model_checkpoint_path)
-            self.saver.restore(self.sess, os.path.join(checkpoint_dir, ckpt_name))
-            counter = int(next(re.finditer("(\d+)(?!.*\d)", ckpt_name)).group(0))
+            ckpt_path = os.path.join(checkpoint_dir, ckpt_name)
+            self.restore(ckpt_path)
+            # let the saver rotate the checkpoints of earlier runs too, not only its own
+            self.saver.recover_last_checkpoints(ckpt.all_model_checkpoint_paths)
+            if os.path.exists(ckpt_path + ".state"):
+                with open(ckpt_path + ".state", "rb") as f:
+                    self.train_state = pickle.load(f)
+                counter = self.train_state['counter']
+                print(" [*] Resuming at epoch {}, batch {}".format(
+                    self.train_state['epoch'], self.train_state['idx']))
+            else:
+                # older checkpoints only carry the step, in their name
+                self.train_state = None
+                counter = int(next(re.finditer("(\d+)(?!.*\d)", ckpt_name)).group(0))
             print(" [*] Success to read {}".format(ckpt_name))
             print(" [*] Load SUCCESS")
             return counter
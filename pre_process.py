@@ -1,33 +1,44 @@
-import scipy.misc
 import numpy as np
 from utils import imread
 
+_warned_no_crop_room = False
+
 
 def get_image(image_path, input_height, input_width,
               resize_height=64, resize_width=64,
-              crop=True, grayscale=False):
-    image = imread(image_path, grayscale)
+              crop=True, grayscale=False, decoder='auto', crop_offset=(0, 0)):
+    image = imread(image_path, grayscale, decoder)
     return transform(image, input_height, input_width,
-                     resize_height, resize_width, crop)
+                     resize_height, resize_width, crop, crop_offset)
 
 
 def center_crop(x, crop_h, crop_w,
-                resize_h=64, resize_w=64):
+                resize_h=64, resize_w=64, offset=(0, 0)):
+    import scipy.misc
+    global _warned_no_crop_room
+
     if crop_w is None:
         crop_w = crop_h
     h, w = x.shape[:2]
-    j = int(round((h - crop_h) / 2.))
-    i = int(round((w - crop_w) / 2.))
+    if tuple(offset) != (0, 0) and h <= crop_h and w <= crop_w and not _warned_no_crop_room:
+        print(" [!] Images of {}x{} leave no room to move the {}x{} crop window, "
+              "random crop offsets have no effect".format(h, w, crop_h, crop_w))
+        _warned_no_crop_room = True
+    # `offset` moves the window away from the center, but never out of the image
+    j = min(max(int(round((h - crop_h) / 2.)) + offset[0], 0), max(h - crop_h, 0))
+    i = min(max(int(round((w - crop_w) / 2.)) + offset[1], 0), max(w - crop_w, 0))
     return scipy.misc.imresize(
         x[j:j + crop_h, i:i + crop_w], [resize_h, resize_w])
 
 
 def transform(image, input_height, input_width,
-              resize_height=64, resize_width=64, crop=True):
+              resize_height=64, resize_width=64, crop=True, crop_offset=(0, 0)):
+    import scipy.misc
+
     if crop:
         cropped_image = center_crop(
             image, input_height, input_width,
-            resize_height, resize_width)
+            resize_height, resize_width, crop_offset)
     else:
         cropped_image = scipy.misc.imresize(image, [resize_height, resize_width])
     return np.array(cropped_image) / 127.5 - 1.
@@ -0,0 +1,142 @@
+"""
+Post-training compression of the generator.
+
+The batch norms of the sampler are folded into the preceding layer, weights
+are optionally magnitude-pruned and then quantized to int8 with one scale per
+output channel. `QuantizedGenerator` keeps the weights as int8 constants and
+dequantizes them in the graph; the per-channel scales are applied to the layer
+outputs. The arithmetic itself stays float32, TF 1.x has no int8 deconv kernel.
+"""
+import numpy as np
+import tensorflow as tf
+
+from model import conv_out_size_same
+
+# (layer, batch norm applied to its output)
+GENERATOR_LAYERS = [
+    ('g_h0_lin', 'g_bn0'),
+    ('g_h1', 'g_bn1'),
+    ('g_h2', 'g_bn2'),
+    ('g_h3', 'g_bn3'),
+    ('g_h4', None),
+]
+
+
+def read_layer(reader, layer):
+    """Returns (weights, biases) of a generator layer from a checkpoint reader."""
+    scope = 'generator/' + layer
+    if layer.endswith('_lin'):
+        return reader.get_tensor(scope + '/Matrix'), reader.get_tensor(scope + '/bias')
+    return reader.get_tensor(scope + '/w'), reader.get_tensor(scope + '/biases')
+
+
+def fold_batch_norm(w, b, reader, bn, epsilon=1e-5):
+    """
+    Folds the inference-mode batch norm `bn` into the layer (w, b). Output
+    channels are on axis 2 of deconv filters and, for the projection, are the
+    innermost dimension of the reshaped output.
+    """
+    scope = 'generator/' + bn
+    gamma = reader.get_tensor(scope + '/gamma')
+    beta = reader.get_tensor(scope + '/beta')
+    mean = reader.get_tensor(scope + '/moving_mean')
+    variance = reader.get_tensor(scope + '/moving_variance')
+    scale = gamma / np.sqrt(variance + epsilon)
+    shift = beta - mean * scale
+    if w.ndim == 2:
+        repeats = w.shape[1] // scale.shape[0]
+        scale, shift = np.tile(scale, repeats), np.tile(shift, repeats)
+        return w * scale[None, :], b * scale + shift
+    return w * scale[None, None, :, None], b * scale + shift
+
+
+def prune(w, sparsity):
+    """Zeroes the `sparsity` fraction of weights with the smallest magnitude."""
+    if sparsity <= 0:
+        return w
+    threshold = np.percentile(np.abs(w), sparsity * 100.)
+    return np.where(np.abs(w) <= threshold, 0., w).astype(w.dtype)
+
+
+def channel_axis(w):
+    return 1 if w.ndim == 2 else 2
+
+
+def quantize_per_channel(w):
+    """Symmetric int8 quantization, returns (int8 weights, float32 scale per output channel)."""
+    axis = channel_axis(w)
+    reduce_axes = tuple(i for i in range(w.ndim) if i != axis)
+    scale = np.abs(w).max(axis=reduce_axes) / 127.
+    scale[scale == 0] = 1.
+    shape = [1] * w.ndim
+    shape[axis] = -1
+    q = np.clip(np.round(w / scale.reshape(shape)), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+
+def compress_generator(reader, sparsity=0.):
+    """
+    Returns a dict of '<layer>/q' (int8), '<layer>/scale' and '<layer>/bias'
+    (float32) arrays, ready for `np.savez_compressed`.
+    """
+    weights = {}
+    for layer, bn in GENERATOR_LAYERS:
+        w, b = read_layer(reader, layer)
+        if bn is not None:
+            w, b = fold_batch_norm(w, b, reader, bn)
+        q, scale = quantize_per_channel(prune(w, sparsity))
+        weights[layer + '/q'] = q
+        weights[layer + '/scale'] = scale
+        weights[layer + '/bias'] = b.astype(np.float32)
+    return weights
+
+
+class QuantizedGenerator(object):
+    def __init__(self, sess, weights, batch_size=4, output_height=650, output_width=650):
+        """
+        Args:
+          sess: TensorFlow session
+          weights: Arrays as returned by `compress_generator` (or the loaded .npz).
+          batch_size: The size of batch, as in the source DCGAN.
+          output_height: (optional) Height of the generated images. [650]
+          output_width: (optional) Width of the generated images. [650]
+        """
+        self.sess = sess
+        self.batch_size = batch_size
+        self.output_height = output_height
+        self.output_width = output_width
+        self.z_dim = weights['g_h0_lin/q'].shape[0]
+        # input channels of the first deconv = depth of the reshaped projection
+        self.depth = weights['g_h1/q'].shape[3]
+        self.build_model(weights)
+
+    def build_model(self, weights):
+        def int8_weights(layer):
+            # cast to float32 so the stock matmul/deconv kernels can be used
+            w = tf.cast(tf.constant(weights[layer + '/q'], name=layer + '_q'), tf.float32)
+            return w, tf.constant(weights[layer + '/scale']), tf.constant(weights[layer + '/bias'])
+
+        with tf.variable_scope("quantized_generator"):
+            s_h, s_w = self.output_height, self.output_width
+            s_h2, s_w2 = conv_out_size_same(s_h, 2), conv_out_size_same(s_w, 2)
+            s_h4, s_w4 = conv_out_size_same(s_h2, 2), conv_out_size_same(s_w2, 2)
+            s_h8, s_w8 = conv_out_size_same(s_h4, 2), conv_out_size_same(s_w4, 2)
+            s_h16, s_w16 = conv_out_size_same(s_h8, 2), conv_out_size_same(s_w8, 2)
+
+            self.z = tf.placeholder(tf.float32, [None, self.z_dim], name='z')
+
+            # project `z` and reshape, batch norms are folded into the weights
+            w, scale, bias = int8_weights('g_h0_lin')
+            h = tf.matmul(self.z, w) * scale + bias
+            h = tf.nn.relu(tf.reshape(h, [-1, s_h16, s_w16, self.depth]))
+
+            shapes = [(s_h8, s_w8), (s_h4, s_w4), (s_h2, s_w2), (s_h, s_w)]
+            for (layer, _), (height, width) in zip(GENERATOR_LAYERS[1:], shapes):
+                w, scale, bias = int8_weights(layer)
+                out_depth = weights[layer + '/q'].shape[2]
+                h = tf.nn.conv2d_transpose(h, w, output_shape=[self.batch_size, height, width, out_depth],
+                                           strides=[1, 2, 2, 1])
+                h = h * scale + bias
+                h = tf.nn.tanh(h) if layer == 'g_h4' else tf.nn.relu(h)
+
+            self.sampler = h
@@ -4,12 +4,10 @@ Some codes from https://github.com/Newmu/dcgan_code
 from __future__ import division
 import math
 import pprint
-import scipy.misc
 import numpy as np
 from six.moves import xrange
 
-import tensorflow as tf
-import tensorflow.contrib.slim as slim
+from decoders import get_decoder
 
 pp = pprint.PrettyPrinter()
 
@@ -17,6 +15,9 @@ get_stddev = lambda x, k_h, k_w: 1 / math.sqrt(k_w * k_h * x.get_shape()[-1])
 
 
 def show_all_variables():
+    import tensorflow as tf
+    import tensorflow.contrib.slim as slim
+
     model_vars = tf.trainable_variables()
     slim.model_analyzer.analyze_vars(model_vars, print_info=True)
 
@@ -26,16 +27,15 @@ def save_images(images, size, image_path):
 
 
 def save_images_onebyone(images, image_path):
+    import scipy.misc
+
     images = np.squeeze(inverse_transform(images))
     for i, img in enumerate(images):
         scipy.misc.imsave(image_path + "_{}.png".format(i), img)
 
 
-def imread(path, grayscale=False):
-    if (grayscale):
-        return scipy.misc.imread(path, flatten=True).astype(np.float)
-    else:
-        return scipy.misc.imread(path).astype(np.float)
+def imread(path, grayscale=False, decoder='auto'):
+    return get_decoder(decoder)(path, grayscale)
 
 
 def merge_images(images, size):
@@ -69,6 +69,8 @@ def merge(images, size):
 
 
 def imsave(images, size, path):
+    import scipy.misc
+
     image = np.squeeze(merge(images, size))
     return scipy.misc.imsave(path, image)
 